@@ -7,15 +7,27 @@ import zipfile
 import ssl
 import certifi
 import json
+import itertools
 import glob
+import math
+import shutil
 import datetime
+import traceback
+import collections
+import time
+import uuid
+import socket
+import sqlite3
+import contextlib
+import argparse
 from datetime import timedelta
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QPushButton, QLineEdit, QLabel, 
                            QProgressBar, QFileDialog, QButtonGroup, QRadioButton,
-                           QSystemTrayIcon, QMenu, QDialog, QListWidget, QListWidgetItem, QCheckBox)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QUrl, QTimer
+                           QSystemTrayIcon, QMenu, QDialog, QListWidget, QListWidgetItem, QCheckBox,
+                           QComboBox, QSpinBox)
+from PyQt6.QtCore import Qt, QThread, QObject, pyqtSignal, QUrl, QTimer
 from PyQt6.QtGui import QIcon, QPixmap, QDragEnterEvent, QDropEvent
 import yt_dlp
 import requests
@@ -116,25 +128,227 @@ class FFmpegInstaller(QThread):
             if os.path.exists(self.ffmpeg_dir):
                 shutil.rmtree(self.ffmpeg_dir)
             raise Exception(f"FFmpeg 설치 실패: {str(e)}")
+def parse_timestamp(text):
+    """'90', '1:30', '1:02:03.5' 형식의 시간을 초 단위로 변환"""
+    seconds = 0.0
+    for part in text.strip().split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_sections(text):
+    """'1:02:00-1:02:30, 인트로' 같은 구간 입력을 (시간 구간 목록, 챕터 이름 목록)으로 변환
+
+    숫자/':'/'-'로만 이루어진 항목은 시간 구간이어야 하며, 그 외 항목은 챕터 이름으로 취급한다.
+    끝 시간을 비우면 영상 끝까지 받는다.
+    """
+    timestamp = r'\d+(?::\d{1,2}){0,2}(?:\.\d+)?'
+    time_ranges, chapters = [], []
+    for item in (text or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        match = re.match(rf'^({timestamp})\s*-\s*({timestamp})?$', item)
+        if not match:
+            if re.fullmatch(r'[\d:.\s-]+', item) and ('-' in item or ':' in item):
+                raise ValueError(f"잘못된 구간입니다: {item}")
+            chapters.append(item)
+            continue
+        start = parse_timestamp(match.group(1))
+        end = parse_timestamp(match.group(2)) if match.group(2) else math.inf
+        if start >= end:
+            raise ValueError(f"구간의 시작이 끝보다 늦습니다: {item}")
+        time_ranges.append((start, end))
+    return time_ranges, chapters
+
+
+def estimate_format_size(fmt, duration):
+    """포맷의 예상 크기(바이트). 크기 정보가 없으면 비트레이트 x 재생 시간으로 추정"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return size
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 125 * duration)  # kbit/s -> byte/s
+    return None
+
+
+def plan_format(formats, format_type, duration=None, max_height=None, max_filesize=None, max_abr=None,
+                clip_ratio=1.0):
+    """제한(최대 해상도/크기/오디오 비트레이트) 안에서 가장 비용이 적은 다운로드 방식을 고른다
+
+    화질은 제한 안에서 가능한 가장 높은 해상도(MP3는 비트레이트)를 목표로 하고,
+    같은 화질이면 받을 바이트 수와 병합/변환 여부를 비용으로 계산해 가장 싼 방식을 선택한다.
+    크기 제한을 만족하는 방식이 없으면 가장 작은 방식을 고르고 'over_limit'을 표시한다.
+    구간만 받는 경우 clip_ratio(받을 길이 / 전체 길이)만큼 예상 크기를 줄여 계산한다.
+    사용할 수 있는 포맷 정보가 없으면 None을 반환한다.
+    """
+    def within_abr(fmt):
+        # 실제 비트레이트는 표기 등급보다 조금 높게 나옴 (예: 128kbps AAC가 abr 129로 표시).
+        # 비율로 여유를 주면 128 제한에 140kbps opus가 들어오므로 몇 kbps만 허용
+        return not max_abr or not fmt.get('abr') or fmt['abr'] <= max_abr + 2
+
+    audio_only = [f for f in formats if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+    plans = []
+
+    if format_type == 'mp3':
+        # MP3는 어느 경우든 ffmpeg 변환이 필요하므로 받을 바이트 수만 비교
+        for fmt in audio_only:
+            size = estimate_format_size(fmt, duration)
+            if size and within_abr(fmt):
+                plans.append({
+                    'format_spec': fmt['format_id'],
+                    'quality': fmt.get('abr') or 0,
+                    'size': size,
+                    'merge': False,
+                    'transcode': fmt.get('ext') != 'mp3',
+                    'description': f"오디오 {int(fmt.get('abr') or 0)}kbps ({fmt.get('ext')})",
+                })
+    else:
+        progressive = [f for f in formats if f.get('ext') == 'mp4'
+                       and f.get('vcodec') not in (None, 'none') and f.get('acodec') not in (None, 'none')]
+        video_only = [f for f in formats if f.get('ext') == 'mp4'
+                      and f.get('vcodec') not in (None, 'none') and f.get('acodec') == 'none']
+        audio = [f for f in audio_only if f.get('ext') == 'm4a' and within_abr(f)]
+        best_audio = max(audio, key=lambda f: (f.get('abr') or 0, -(estimate_format_size(f, duration) or 0)), default=None)
+
+        for fmt in progressive:
+            size = estimate_format_size(fmt, duration)
+            if size and (not max_height or (fmt.get('height') or 0) <= max_height):
+                plans.append({
+                    'format_spec': fmt['format_id'],
+                    'quality': fmt.get('height') or 0,
+                    'size': size,
+                    'merge': False,
+                    'transcode': False,
+                    'description': f"{fmt.get('height')}p 단일 파일 (병합 없음)",
+                })
+
+        audio_size = estimate_format_size(best_audio, duration) if best_audio else None
+        for fmt in video_only:
+            size = estimate_format_size(fmt, duration)
+            if size and audio_size and (not max_height or (fmt.get('height') or 0) <= max_height):
+                plans.append({
+                    'format_spec': f"{fmt['format_id']}+{best_audio['format_id']}",
+                    'quality': fmt.get('height') or 0,
+                    'size': size + audio_size,
+                    'merge': True,
+                    'transcode': False,
+                    'description': f"{fmt.get('height')}p 영상 + 오디오 병합",
+                })
+
+    if not plans:
+        return None
+    for plan in plans:
+        plan['size'] = int(plan['size'] * clip_ratio)
+
+    def cost(plan):
+        # 병합/변환은 두 번의 전송과 ffmpeg 작업이 추가되므로 크기의 10%만큼 비용을 더함
+        penalty = 0.1 * plan['size'] if plan['merge'] or plan['transcode'] else 0
+        return plan['size'] + penalty
+
+    fitting = [plan for plan in plans if not max_filesize or plan['size'] <= max_filesize]
+    if not fitting:
+        plan = dict(min(plans, key=lambda plan: plan['size']), over_limit=True)
+        return plan
+
+    target_quality = max(plan['quality'] for plan in fitting)
+    plan = min((plan for plan in fitting if plan['quality'] == target_quality), key=cost)
+    return dict(plan, over_limit=False)
+
+
+class FilePublisher:
+    """임시(스크래치) 폴더에서 완성된 파일을 최종 저장 위치로 옮기는 백그라운드 복사기"""
+
+    def __init__(self, max_workers=2):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, src, dest_dir):
+        return self.executor.submit(self.publish, src, dest_dir)
+
+    @staticmethod
+    def place(src, dst):
+        """src를 dst로 옮기되 같은 이름의 파일이 있으면 덮어쓰지 않고 ' (1)' 등을 붙인다. 옮긴 경로를 반환"""
+        root, ext = os.path.splitext(dst)
+        for index in itertools.count():
+            candidate = f"{root} ({index}){ext}" if index else dst
+            try:
+                # 하드 링크는 대상이 이미 있으면 실패하므로 확인과 생성이 한 번에 이루어짐
+                os.link(src, candidate)
+            except FileExistsError:
+                continue
+            except OSError:
+                # 하드 링크를 지원하지 않는 파일시스템: 확인 후 이름 변경 (다른 드라이브면 여기서 OSError)
+                if os.path.exists(candidate):
+                    continue
+                os.replace(src, candidate)
+                return candidate
+            os.remove(src)
+            return candidate
+
+    @classmethod
+    def publish(cls, src, dest_dir):
+        dst = os.path.join(dest_dir, os.path.basename(src))
+        try:
+            return cls.place(src, dst)  # 같은 드라이브면 이름 변경만으로 끝남
+        except OSError:
+            pass
+
+        # 다른 드라이브/네트워크 공유: 임시 이름으로 복사한 뒤 옮겨 완성된 파일만 보이게 함
+        tmp_path = f"{dst}.{uuid.uuid4().hex[:8]}.publishing"
+        try:
+            with open(src, 'rb') as fsrc, open(tmp_path, 'wb') as fdst:
+                # 크기를 미리 잡아 두면 SMB 등에서 파일 확장 요청과 조각화가 줄어듦
+                fdst.truncate(os.path.getsize(src))
+                fdst.seek(0)
+                shutil.copyfileobj(fsrc, fdst, 8 * 1024 * 1024)
+            dst = cls.place(tmp_path, dst)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.remove(src)
+        return dst
+
 class DownloadThread(QThread):
     progress = pyqtSignal(dict)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
     playlist_progress = pyqtSignal(dict)  # 플레이리스트 진행 상황을 위한 시그널
+    format_plan = pyqtSignal(dict)  # 다운로드 전에 선택된 포맷과 예상 크기
 
-    def __init__(self, url, format_type, download_path, is_playlist=False):
+    def __init__(self, url, format_type, download_path, is_playlist=False,
+                 max_height=None, max_filesize=None, max_abr=None,
+                 scratch_path=None, publisher=None, time_ranges=None, chapters=None, precise_cuts=False):
         super().__init__()
         self.url = url
         self.format_type = format_type
         self.download_path = download_path
+        self.scratch_path = scratch_path  # 조각/병합/변환 작업을 할 빠른 로컬 폴더 (없으면 저장 위치에서 바로 작업)
+        self.scratch_job_dir = None
+        self.publisher = publisher or FilePublisher()
+        self.pending_publishes = []
+        self.partial_files = set()  # 취소 시 지울 이 작업의 .part 파일
+        self.downloaded_files = []  # 단일 영상에서 받은 파일 (구간마다 하나씩)
+        # 구간 다운로드: 해당 시간 구간/챕터를 덮는 부분만 받음
+        self.time_ranges = time_ranges or []
+        self.chapters = chapters or []
+        self.precise_cuts = precise_cuts  # 키프레임이 아닌 위치도 정확히 자르기 (구간을 다시 인코딩)
         self.is_cancelled = False
         self.is_playlist = is_playlist
+        self.max_height = max_height
+        self.max_filesize = max_filesize
+        self.max_abr = max_abr
         self.current_video_index = 0
         self.total_videos = 0
+        self.playlist_entries = []  # 항목별 간단한 기록 (id, title, duration, status)
+        self.ydl = None
+        self.current_info = None  # 포맷을 계획 중인 영상의 처리 전 정보
 
     def progress_hook(self, d):
+        if d.get('tmpfilename'):
+            self.partial_files.add(d['tmpfilename'])
         if self.is_cancelled:
-            raise Exception("다운로드가 취소되었습니다. 취소 후 PART파일을 삭제해주세요.")
+            raise Exception("다운로드가 취소되었습니다.")
             
         if d['status'] == 'downloading':
             downloaded = d.get('downloaded_bytes', 0)
@@ -156,20 +370,152 @@ class DownloadThread(QThread):
                 progress_data['total_videos'] = self.total_videos
                 
             self.progress.emit(progress_data)
-        
-        elif d['status'] == 'finished' and self.is_playlist:
+
+    def download_video(self, ydl, ie_result):
+        """영상 정보를 받아 다운로드 (포맷은 select_format에서 계획)
+
+        받은 파일마다 경로를 반환한다. 임시 폴더를 쓰는 경우에는 최종 경로를 돌려줄 복사 작업(Future)을 반환한다.
+        """
+        self.current_info = self.resolve_url_result(ydl, ie_result)
+        info = ydl.process_ie_result(self.current_info, download=True)
+        if 'requested_downloads' in info:
+            # 구간을 여러 개 받으면 구간마다 파일이 생기며, 후처리(MP3 변환 등)가 끝난 경로가 filepath에 있음
+            filenames = [download['filepath'] for download in info['requested_downloads'] if download.get('filepath')]
+        else:
+            filenames = [ydl.prepare_filename(info)]
+            if self.format_type == 'mp3':
+                filenames = [os.path.splitext(filenames[0])[0] + '.mp3']
+        if not filenames:
+            if self.time_ranges or self.chapters:
+                raise Exception("지정한 구간이나 챕터에 해당하는 부분이 없어 받은 파일이 없습니다.")
+            raise Exception("받은 파일이 없습니다.")
+
+        if not self.scratch_job_dir:
+            return filenames
+        # 다음 항목 다운로드와 겹치도록 최종 위치로의 복사는 백그라운드에서 진행
+        futures = [self.publisher.submit(filename, self.download_path) for filename in filenames]
+        self.pending_publishes.extend(futures)
+        return futures
+
+    def wait_for_publishes(self, cancel=False):
+        """진행 중인 복사가 모두 끝날 때까지 기다린 뒤 첫 번째 오류를 다시 발생시킴"""
+        if cancel:
+            for future in self.pending_publishes:
+                future.cancel()
+        concurrent.futures.wait(self.pending_publishes)
+        futures, self.pending_publishes = self.pending_publishes, []
+        for future in futures:
+            if not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+
+    def clip_ratio(self, info):
+        """전체 영상 중 실제로 받을 길이의 비율 (구간 지정이 없으면 1)"""
+        duration = info.get('duration')
+        if not duration or not (self.time_ranges or self.chapters):
+            return 1.0
+        spans = [(start, min(end, duration)) for start, end in self.time_ranges]
+        for chapter in info.get('chapters') or []:
+            if any(re.search(regex, chapter.get('title') or '', re.IGNORECASE) for regex in self.chapter_patterns()):
+                spans.append((chapter['start_time'], chapter['end_time']))
+        if not spans:
+            return 1.0  # 챕터 정보가 아직 없는 경우 전체 크기로 추정
+        return min(1.0, sum(max(0, end - start) for start, end in spans) / duration)
+
+    def chapter_patterns(self):
+        return ['(?i)' + re.escape(chapter) for chapter in self.chapters]
+
+    def select_format(self, ctx):
+        """yt-dlp 포맷 선택 콜백: 처리 후 남은 포맷으로 계획하고, 계획한 포맷이 없으면 기본 포맷으로 대체"""
+        info = self.current_info or {}
+        plan = plan_format(ctx['formats'], self.format_type, info.get('duration'),
+                           self.max_height, self.max_filesize, self.max_abr, self.clip_ratio(info))
+        format_spec = self.default_format()
+        if plan:
+            plan['title'] = info.get('title')
+            self.format_plan.emit(plan)
+            format_spec = f"{plan['format_spec']}/{format_spec}"
+        yield from self.ydl.build_format_selector(format_spec)(ctx)
+
+    @staticmethod
+    def resolve_url_result(ydl, info):
+        while info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        return info
+
+    def default_format(self):
+        return 'bestaudio/best' if self.format_type == 'mp3' else 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]'
+
+    def download_playlist(self, ydl):
+        """플레이리스트 항목을 페이지 단위로 받아오면서 하나씩 바로 다운로드"""
+        # process=False로 받으면 entries가 지연 생성되어 전체 목록을 미리 풀지 않음
+        info = self.resolve_url_result(ydl, ydl.extract_info(self.url, download=False, process=False))
+
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            return self.download_video(ydl, info)
+
+        self.total_videos = info.get('playlist_count') or 0
+        self.current_video_index = 0
+        self.playlist_entries = []
+        failed = 0
+
+        for entry in info.get('entries') or []:
+            if self.is_cancelled:
+                raise Exception("다운로드가 취소되었습니다.")
+            if not entry:
+                continue
+
+            record = {
+                'id': entry.get('id'),
+                'title': entry.get('title'),
+                'duration': entry.get('duration'),
+                'status': 'downloading',
+            }
+            self.playlist_entries.append(record)
+            self.total_videos = max(self.total_videos, self.current_video_index + 1)
+
+            try:
+                # 반환되는 전체 info dict는 보관하지 않아 항목 수와 관계없이 메모리가 일정하게 유지됨
+                self.download_video(ydl, entry)
+                record['status'] = 'finished'
+            except Exception as e:
+                if self.is_cancelled:
+                    raise
+                record['status'] = 'error'
+                record['error'] = str(e)
+                failed += 1
+
             self.current_video_index += 1
             self.playlist_progress.emit({
                 'current': self.current_video_index,
-                'total': self.total_videos
+                'total': self.total_videos,
+                'failed': failed,
+                **record,
             })
 
+        if failed:
+            failed_titles = [record['title'] or record['id'] for record in self.playlist_entries
+                             if record['status'] == 'error']
+            names = ', '.join(failed_titles[:3])
+            if len(failed_titles) > 3:
+                names += f" 외 {len(failed_titles) - 3}개"
+            return f"플레이리스트 다운로드 완료: {self.current_video_index}개 중 {failed}개 실패 ({names})"
+        return "플레이리스트 다운로드 완료"
+
     def run(self):
+        filename = error = None
         try:
-            output_path = os.path.join(self.download_path, '%(title)s.%(ext)s')
+            work_dir = self.download_path
+            if self.scratch_path:
+                work_dir = self.scratch_job_dir = os.path.join(self.scratch_path, f"job-{uuid.uuid4().hex[:12]}")
+                os.makedirs(work_dir, exist_ok=True)
+            if self.time_ranges or self.chapters:
+                # 끝 시간이 비어 있으면 section_end가 inf가 되므로 시작 시각만 이름에 붙임
+                output_path = os.path.join(work_dir, '%(title)s [%(section_start)d].%(ext)s')
+            else:
+                output_path = os.path.join(work_dir, '%(title)s.%(ext)s')
             
             options = {
-                'format': 'bestaudio/best' if self.format_type == 'mp3' else 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]',
+                'format': self.select_format,
                 'outtmpl': output_path,
                 'postprocessors': [{
                     'key': 'FFmpegExtractAudio',
@@ -188,32 +534,395 @@ class DownloadThread(QThread):
                 'noprogress': True,
             }
 
-            if self.is_playlist:
-                options['extract_flat'] = False
-                options['playlistend'] = None
+            if self.time_ranges or self.chapters:
+                options['download_ranges'] = yt_dlp.utils.download_range_func(self.chapter_patterns(), self.time_ranges)
+                options['force_keyframes_at_cuts'] = self.precise_cuts
 
             with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
                 with yt_dlp.YoutubeDL(options) as ydl:
+                    self.ydl = ydl
                     if self.is_playlist:
-                        info = ydl.extract_info(self.url, download=False)
-                        self.total_videos = len(info['entries']) if '_type' in info and info['_type'] == 'playlist' else 1
-                        self.current_video_index = 0
-                    
-                    info = ydl.extract_info(self.url, download=True)
-                    if isinstance(info, dict):
-                        filename = ydl.prepare_filename(info)
-                        if self.format_type == 'mp3':
-                            filename = os.path.splitext(filename)[0] + '.mp3'
+                        results = self.download_playlist(ydl)
+                    else:
+                        results = self.download_video(ydl, ydl.extract_info(self.url, download=False, process=False))
+                    self.wait_for_publishes()
+                    if isinstance(results, str):
+                        filename = results  # 플레이리스트 완료 메시지
                     else:
-                        filename = "플레이리스트 다운로드 완료"
-                    self.finished.emit(filename)
+                        self.downloaded_files = [result.result() if isinstance(result, concurrent.futures.Future)
+                                                 else result for result in results]
+                        filename = self.downloaded_files[0]
 
         except Exception as e:
-            self.error.emit(str(e))
+            error = str(e)
+        finally:
+            if self.scratch_job_dir:
+                try:
+                    self.wait_for_publishes(cancel=True)
+                except Exception as e:
+                    print(f"파일 이동 중 오류: {str(e)}")
+                shutil.rmtree(self.scratch_job_dir, ignore_errors=True)
+                self.scratch_job_dir = None
+            elif self.is_cancelled:
+                for partial_file in self.partial_files:
+                    # 조각 다운로드는 '.part-Frag1' 같은 파일도 남김
+                    for path in glob.glob(glob.escape(partial_file) + '*'):
+                        try:
+                            os.remove(path)
+                        except OSError as e:
+                            print(f"임시 파일 정리 중 오류: {str(e)}")
+
+        # 파일 이동과 정리가 모두 끝난 뒤에 알려야 화면이 먼저 풀려서 새 다운로드가 겹치지 않음
+        if error is not None:
+            self.error.emit(error)
+        else:
+            self.finished.emit(filename)
 
     def cancel(self):
         self.is_cancelled = True
 
+class SQLiteJobStore:
+    """sqlite 파일 하나를 여러 워커 프로세스가 공유하는 작업 저장소 (lease 방식)"""
+
+    def __init__(self, db_path, max_attempts=3):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    format_type TEXT NOT NULL,
+                    download_path TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    created REAL NOT NULL,
+                    sections TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'sections' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN sections TEXT NOT NULL DEFAULT ''")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_job(self, url, format_type, download_path, sections=''):
+        with contextlib.closing(self._connect()) as conn:
+            cur = conn.execute(
+                "INSERT INTO jobs (url, format_type, download_path, sections, created) VALUES (?, ?, ?, ?, ?)",
+                (url, format_type, download_path, sections, time.time())
+            )
+            return str(cur.lastrowid)
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE로 쓰기 잠금을 먼저 잡아 두 워커가 같은 작업을 가져가지 않게 함
+            conn.execute("BEGIN IMMEDIATE")
+            # 마지막 시도에서 워커가 멈춘 작업은 다시 가져가지 않고 실패 처리 (DirectoryJobStore와 동일)
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, lease_expires = NULL "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE "
+                "status = 'pending' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker_id, now + lease_seconds, row['id'])
+            )
+            conn.execute("COMMIT")
+            return {
+                'id': str(row['id']),
+                'url': row['url'],
+                'format_type': row['format_type'],
+                'download_path': row['download_path'],
+                'sections': row['sections'],
+                'attempts': row['attempts'] + 1,
+            }
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        with contextlib.closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, int(job_id), worker_id)
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        with contextlib.closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (result, int(job_id), worker_id)
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        with contextlib.closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = NULL, result = ? "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (self.max_attempts, error, int(job_id), worker_id)
+            )
+            return cur.rowcount == 1
+
+
+class DirectoryJobStore:
+    """공유 파일시스템 디렉터리 기반 작업 저장소
+
+    pending/<id>.json -> running/<id>@<worker>.json -> done|failed/<id>.json 으로
+    os.rename 하여 작업을 가져간다. rename은 같은 파일시스템에서 원자적이므로 한 워커만 성공한다.
+    lease는 running 파일의 수정 시각으로 표시하고 heartbeat가 이를 갱신한다.
+    """
+
+    def __init__(self, root, max_attempts=3):
+        self.root = root
+        self.max_attempts = max_attempts
+        for name in ('pending', 'running', 'done', 'failed'):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, state, name):
+        return os.path.join(self.root, state, name)
+
+    def _running_name(self, job_id, worker_id):
+        return f"{job_id}@{worker_id.replace('@', '_')}.json"
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write(path, job, lease_expires=None):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        if lease_expires is not None:
+            os.utime(tmp_path, (lease_expires, lease_expires))
+        os.replace(tmp_path, path)
+
+    def add_job(self, url, format_type, download_path, sections=''):
+        job_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        self._write(self._path('pending', f"{job_id}.json"), {
+            'id': job_id,
+            'url': url,
+            'format_type': format_type,
+            'download_path': download_path,
+            'sections': sections,
+            'attempts': 0,
+            'created': time.time(),
+        })
+        return job_id
+
+    def _take(self, src, job_id, worker_id, lease_seconds):
+        dst = self._path('running', self._running_name(job_id, worker_id))
+        # rename 전에 lease를 먼저 연장해야 옮겨진 파일이 다른 워커에게 만료된 것으로 보이지 않음
+        expires = time.time() + lease_seconds
+        try:
+            os.utime(src, (expires, expires))
+            os.rename(src, dst)
+            job = self._read(dst)
+        except OSError:
+            return None  # 다른 워커가 먼저 가져감
+        if job.get('attempts', 0) >= self.max_attempts:
+            try:
+                os.replace(dst, self._path('failed', f"{job_id}.json"))
+            except OSError:
+                pass
+            return None
+        job['attempts'] = job.get('attempts', 0) + 1
+        self._write(dst, job, lease_expires=expires)
+        return job
+
+    def claim(self, worker_id, lease_seconds):
+        for name in sorted(os.listdir(self._path('pending', ''))):
+            if not name.endswith('.json'):
+                continue
+            job = self._take(self._path('pending', name), name[:-5], worker_id, lease_seconds)
+            if job is not None:
+                return job
+
+        now = time.time()
+        for name in sorted(os.listdir(self._path('running', ''))):
+            if not name.endswith('.json') or '@' not in name:
+                continue
+            src = self._path('running', name)
+            try:
+                lease_expires = os.path.getmtime(src)
+            except OSError:
+                continue
+            if lease_expires < now:
+                job = self._take(src, name.split('@', 1)[0], worker_id, lease_seconds)
+                if job is not None:
+                    return job
+        return None
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        # mtime을 lease 만료 시각으로 사용
+        expires = time.time() + lease_seconds
+        try:
+            os.utime(self._path('running', self._running_name(job_id, worker_id)), (expires, expires))
+            return True
+        except OSError:
+            return False
+
+    def _finish(self, job_id, worker_id, result, failed=False):
+        src = self._path('running', self._running_name(job_id, worker_id))
+        try:
+            job = self._read(src)
+        except OSError:
+            return False  # lease를 잃음
+        job['result'] = result
+        if not failed:
+            state = 'done'
+        else:
+            state = 'failed' if job.get('attempts', 0) >= self.max_attempts else 'pending'
+        # 결과까지 쓴 파일을 한 번에 옮겨 놓아야 pending에 나타나자마자 다른 워커가 가져가도 안전함.
+        # running 파일은 그 다음에 지워서 중간에 작업이 사라지지 않게 함
+        self._write(self._path(state, f"{job_id}.json"), job)
+        try:
+            os.remove(src)
+        except OSError:
+            pass
+        return True
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, result)
+
+    def fail(self, job_id, worker_id, error):
+        return self._finish(job_id, worker_id, error, failed=True)
+
+
+def open_job_store(location):
+    """.db/.sqlite/.sqlite3 파일이면 sqlite 저장소, 그 외에는 디렉터리 저장소를 연다"""
+    if os.path.splitext(location)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteJobStore(location)
+    return DirectoryJobStore(location)
+
+
+def run_download_job(job, should_continue, scratch_path=None):
+    """작업 하나를 DownloadThread로 실행하고 저장된 파일 이름을 반환"""
+    outcome = {}
+    time_ranges, chapters = parse_sections(job.get('sections'))
+    thread = DownloadThread(job['url'], job['format_type'], job['download_path'], scratch_path=scratch_path,
+                            time_ranges=time_ranges, chapters=chapters)
+    # 워커 모드에는 Qt 이벤트 루프가 없으므로 시그널을 다운로드 스레드에서 바로 처리
+    thread.finished.connect(lambda filename: outcome.update(filename=filename),
+                            Qt.ConnectionType.DirectConnection)
+    thread.error.connect(lambda msg: outcome.update(error=msg),
+                         Qt.ConnectionType.DirectConnection)
+    thread.start()
+    while not thread.wait(1000):
+        if not should_continue():
+            thread.cancel()
+    if 'error' in outcome:
+        raise Exception(outcome['error'])
+    return outcome.get('filename', '')
+
+
+def run_worker(store, worker_id=None, lease_seconds=60, poll_interval=5, drain=False, runner=run_download_job):
+    """작업 저장소에서 작업을 가져와 처리하는 워커 루프
+
+    runner(job, should_continue)는 결과 문자열을 반환하고 실패 시 예외를 던진다.
+    lease를 잃으면 should_continue()가 False를 반환하므로 runner는 작업을 중단해야 한다.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    while True:
+        try:
+            job = store.claim(worker_id, lease_seconds)
+        except Exception as e:
+            # 잠긴 DB나 네트워크 공유 오류 때문에 워커가 끝나지 않도록 잠시 뒤 다시 시도
+            print(f"[{worker_id}] 작업 저장소 오류: {str(e)}")
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if drain:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[{worker_id}] 작업 {job['id']} 시작: {job['url']}")
+        lease_lost = threading.Event()
+        stop_heartbeat = threading.Event()
+
+        def keep_lease(job_id=job['id']):
+            last_renewed = time.time()
+            while not stop_heartbeat.wait(lease_seconds / 3):
+                try:
+                    renewed = store.heartbeat(job_id, worker_id, lease_seconds)
+                except Exception as e:
+                    print(f"[{worker_id}] 작업 {job_id} lease 갱신 오류: {str(e)}")
+                    # 일시적인 오류는 다시 시도하되, lease가 끝날 때가 되면 잃은 것으로 보고 작업을 멈춤
+                    if time.time() - last_renewed < lease_seconds * 2 / 3:
+                        continue
+                    renewed = False
+                if not renewed:
+                    lease_lost.set()
+                    return
+                last_renewed = time.time()
+
+        heartbeat_thread = threading.Thread(target=keep_lease, daemon=True)
+        heartbeat_thread.start()
+        try:
+            result = runner(job, lambda: not lease_lost.is_set())
+        except Exception as e:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+            print(f"[{worker_id}] 작업 {job['id']} 실패: {str(e)}")
+            if not lease_lost.is_set():
+                try:
+                    store.fail(job['id'], worker_id, str(e))
+                except Exception as store_error:
+                    print(f"[{worker_id}] 작업 {job['id']} 실패 기록 오류: {str(store_error)}")
+            continue
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+        try:
+            completed = not lease_lost.is_set() and store.complete(job['id'], worker_id, result)
+        except Exception as e:
+            print(f"[{worker_id}] 작업 {job['id']} 완료 기록 오류: {str(e)}")
+            continue
+        if not completed:
+            print(f"[{worker_id}] 작업 {job['id']}의 lease를 잃어 결과를 기록하지 못했습니다.")
+        else:
+            print(f"[{worker_id}] 작업 {job['id']} 완료: {result}")
+
+
+def enqueue_jobs(store, url, format_type, download_path, sections=''):
+    """URL을 작업 저장소에 추가. 플레이리스트는 항목별 작업으로 나눠서 여러 워커가 나눠 받을 수 있게 함"""
+    parse_sections(sections)  # 잘못된 구간은 작업을 넣기 전에 알림
+    with yt_dlp.YoutubeDL({'extract_flat': 'in_playlist', 'quiet': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if info.get('_type') == 'playlist':
+        urls = [entry.get('url') or entry.get('webpage_url') for entry in info.get('entries') or []]
+        urls = [entry_url for entry_url in urls if entry_url]
+    else:
+        urls = [url]
+    return [store.add_job(entry_url, format_type, download_path, sections) for entry_url in urls]
+
+
 class VideoInfoThread(QThread):
     info_received = pyqtSignal(dict)
     error = pyqtSignal(str)
@@ -236,12 +945,147 @@ class VideoInfoThread(QThread):
         except Exception as e:
             self.error.emit(str(e))
 
+def get_diagnostics_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'diagnostics')
+
+
+class EventLoopMonitor(QObject):
+    """GUI 이벤트 루프 지연을 heartbeat 타이머로 측정하고, 멈춤이 생기면 메인 스레드 스택과 함께 기록
+
+    타이머는 메인 스레드에서 돌고 별도의 감시 스레드가 마지막 heartbeat 시각을 확인한다.
+    메인 스레드가 멈춰 있는 동안 감시 스레드가 그 순간의 스택을 떠서 어떤 코드가 막고 있는지 남긴다.
+    """
+
+    def __init__(self, log_dir, interval_ms=50, stall_threshold_ms=200, parent=None):
+        super().__init__(parent)
+        self.log_dir = log_dir
+        self.interval = interval_ms / 1000
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.main_thread_id = threading.get_ident()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.heartbeat)
+        self.lock = threading.Lock()
+        self.log_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.watchdog = None
+        self.log_file = None
+        self.last_beat = 0.0
+        self.stall_reported = False
+        self.beats = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    def start(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.log_file = open(os.path.join(self.log_dir, 'event_loop.log'), 'a', encoding='utf-8')
+        self.log(f"진단 모드 시작 (heartbeat {self.interval * 1000:.0f}ms, 멈춤 기준 {self.stall_threshold * 1000:.0f}ms)")
+        self.last_beat = time.perf_counter()
+        self.stop_event.clear()
+        self.watchdog = threading.Thread(target=self.watch, name='EventLoopWatchdog', daemon=True)
+        self.watchdog.start()
+        self.timer.start(int(self.interval * 1000))
+
+    def stop(self):
+        self.timer.stop()
+        self.stop_event.set()
+        if self.watchdog:
+            self.watchdog.join()
+            self.watchdog = None
+        average = self.total_lag / self.beats * 1000 if self.beats else 0
+        self.log(f"진단 모드 종료 (평균 지연 {average:.1f}ms, 최대 지연 {self.max_lag * 1000:.0f}ms, 멈춤 {self.stalls}회)")
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def heartbeat(self):
+        now = time.perf_counter()
+        with self.lock:
+            lag = max(0.0, now - self.last_beat - self.interval)
+            self.last_beat = now
+            self.stall_reported = False
+        self.beats += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            self.log(f"메인 스레드 멈춤: {lag * 1000:.0f}ms")
+
+    def watch(self):
+        while not self.stop_event.wait(self.stall_threshold / 2):
+            with self.lock:
+                blocked = time.perf_counter() - self.last_beat - self.interval
+                if blocked < self.stall_threshold or self.stall_reported:
+                    continue
+                self.stall_reported = True
+            frame = sys._current_frames().get(self.main_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else "(스택을 가져올 수 없음)\n"
+            self.log(f"메인 스레드가 {blocked * 1000:.0f}ms 넘게 응답하지 않음. 현재 스택:\n{stack}")
+
+    def log(self, message):
+        with self.log_lock:
+            if self.log_file:
+                self.log_file.write(f"{datetime.datetime.now().isoformat(timespec='milliseconds')} {message}\n")
+                self.log_file.flush()
+
+
+class StackSampler:
+    """일정 간격으로 모든 스레드의 스택을 샘플링하는 프로파일러
+
+    결과는 flamegraph 도구에서 바로 읽을 수 있는 collapsed stack 형식(한 줄에 '스택 횟수')으로 저장한다.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.samples.clear()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sample, name='StackSampler', daemon=True)
+        self.thread.start()
+
+    def sample(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"Thread-{thread_id}"))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self, log_dir, name='job'):
+        """샘플링을 멈추고 결과 파일 경로를 반환"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, f"profile-{name}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
 class YouTubeDownloader(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Youtube Extractor")
         self.setMinimumWidth(600)
-        
+
+        self.event_loop_monitor = None  # 진단 모드
+        self.profile_jobs = False
+        self.job_sampler = None
+
         self.create_tray_icon()
         
         self.setup_ui()
@@ -256,9 +1100,15 @@ class YouTubeDownloader(QMainWindow):
         
         tray_menu = QMenu()
         show_action = tray_menu.addAction("보이기")
+        self.diagnostics_action = tray_menu.addAction("진단 모드")
+        self.diagnostics_action.setCheckable(True)
+        self.profile_action = tray_menu.addAction("다운로드 작업 프로파일링")
+        self.profile_action.setCheckable(True)
         quit_action = tray_menu.addAction("종료")
         
         show_action.triggered.connect(self.show)
+        self.diagnostics_action.toggled.connect(self.set_diagnostics_enabled)
+        self.profile_action.toggled.connect(self.set_job_profiling_enabled)
         quit_action.triggered.connect(self.quit_application)
         
         self.tray_icon.activated.connect(self.tray_icon_activated)
@@ -285,8 +1135,42 @@ class YouTubeDownloader(QMainWindow):
             self.tray_icon.hide()
             event.accept()
 
+    def set_diagnostics_enabled(self, enabled):
+        if enabled and self.event_loop_monitor is None:
+            self.event_loop_monitor = EventLoopMonitor(get_diagnostics_dir(), parent=self)
+            self.event_loop_monitor.start()
+            self.show_status(f"진단 모드: 기록 위치 {get_diagnostics_dir()}", "info", 3000)
+        elif not enabled and self.event_loop_monitor is not None:
+            self.event_loop_monitor.stop()
+            self.event_loop_monitor = None
+        self.diagnostics_action.setChecked(enabled)
+
+    def set_job_profiling_enabled(self, enabled):
+        self.profile_jobs = enabled
+        self.profile_action.setChecked(enabled)
+
+    def stop_job_profile(self):
+        """작업 프로파일링을 멈추고 저장한 파일 경로를 반환 (프로파일링 중이 아니면 None)"""
+        if self.job_sampler is None:
+            return None
+        path = self.job_sampler.stop(get_diagnostics_dir(), 'download')
+        self.job_sampler = None
+        if self.event_loop_monitor:
+            self.event_loop_monitor.log(f"다운로드 작업 프로파일 저장: {path}")
+        return path
+
+    def show_job_result(self, message, status_type, duration):
+        """작업 결과를 상태 표시줄에 보여주고, 프로파일링 중이었다면 저장 경로를 함께 표시"""
+        profile_path = self.stop_job_profile()
+        if profile_path:
+            message = f"{message} (프로파일 저장: {profile_path})"
+            duration = max(duration, 8000)
+        self.show_status(message, status_type, duration)
+
     def quit_application(self):
         self.is_quitting = True
+        self.stop_job_profile()
+        self.set_diagnostics_enabled(False)
         QApplication.quit()
 
     @staticmethod
@@ -312,6 +1196,17 @@ class YouTubeDownloader(QMainWindow):
                 border-radius: 6px;
                 color: white;
             }
+            QComboBox, QSpinBox {
+                padding: 6px;
+                background-color: rgba(255, 255, 255, 0.1);
+                border: 1px solid rgba(255, 255, 255, 0.1);
+                border-radius: 6px;
+                color: white;
+            }
+            QComboBox QAbstractItemView {
+                background-color: #2D2A4A;
+                color: white;
+            }
             QPushButton {
                 padding: 8px 16px;
                 border-radius: 6px;
@@ -407,10 +1302,43 @@ class YouTubeDownloader(QMainWindow):
         format_layout.addStretch()
         layout.addLayout(format_layout)
 
+        # 화질/크기 제한: 제한 안에서 병합·전송 비용이 가장 적은 포맷을 고름
+        limit_layout = QHBoxLayout()
+        self.max_height_combo = QComboBox()
+        for text, height in [("최대 해상도: 제한 없음", None), ("1080p", 1080), ("720p", 720),
+                             ("480p", 480), ("360p", 360)]:
+            self.max_height_combo.addItem(text, height)
+        self.max_abr_combo = QComboBox()
+        for text, abr in [("최대 음질: 제한 없음", None), ("160kbps", 160), ("128kbps", 128), ("64kbps", 64)]:
+            self.max_abr_combo.addItem(text, abr)
+        self.max_size_spin = QSpinBox()
+        self.max_size_spin.setRange(0, 100000)
+        self.max_size_spin.setSingleStep(50)
+        self.max_size_spin.setSuffix(" MB")
+        self.max_size_spin.setSpecialValueText("최대 크기: 제한 없음")
+
+        limit_layout.addWidget(self.max_height_combo)
+        limit_layout.addWidget(self.max_abr_combo)
+        limit_layout.addWidget(self.max_size_spin)
+        limit_layout.addStretch()
+        layout.addLayout(limit_layout)
+
+        # 구간 다운로드: 지정한 시간 구간/챕터만 받음
+        section_layout = QHBoxLayout()
+        self.sections_input = QLineEdit()
+        self.sections_input.setPlaceholderText("받을 구간 (선택, 예: 1:02:00-1:02:30, 챕터 이름)")
+        self.precise_cut_check = QCheckBox("정확히 자르기")
+        self.precise_cut_check.setToolTip("키프레임이 아닌 위치도 정확히 자릅니다 (구간을 다시 인코딩하므로 느려집니다)")
+        section_layout.addWidget(self.sections_input)
+        section_layout.addWidget(self.precise_cut_check)
+        layout.addLayout(section_layout)
+
         input_layout = QHBoxLayout()
         self.url_input = QLineEdit()
         self.url_input.setPlaceholderText("YouTube URL을 입력하세요")
         self.location_btn = QPushButton("저장 위치")
+        self.scratch_btn = QPushButton("임시 폴더")
+        self.scratch_btn.setToolTip("다운로드 조각과 병합/변환 작업을 할 빠른 로컬 폴더 (선택)")
         self.download_btn = QPushButton("다운로드")
         self.download_btn.setObjectName("downloadBtn")
         self.cancel_btn = QPushButton("취소")
@@ -419,6 +1347,7 @@ class YouTubeDownloader(QMainWindow):
         
         input_layout.addWidget(self.url_input)
         input_layout.addWidget(self.location_btn)
+        input_layout.addWidget(self.scratch_btn)
         input_layout.addWidget(self.download_btn)
         input_layout.addWidget(self.cancel_btn)
         layout.addLayout(input_layout)
@@ -455,12 +1384,16 @@ class YouTubeDownloader(QMainWindow):
         layout.addWidget(self.status_label)
 
         self.location_btn.clicked.connect(self.select_directory)
+        self.scratch_btn.clicked.connect(self.select_scratch_directory)
         self.download_btn.clicked.connect(self.start_download)
         self.cancel_btn.clicked.connect(self.cancel_download)
         self.url_input.textChanged.connect(self.fetch_video_info)
 
         self.download_path = ""
+        self.scratch_path = ""
+        self.file_publisher = FilePublisher(max_workers=2)
         self.download_thread = None
+        self.finishing_threads = []  # 결과를 알린 뒤 아직 완전히 끝나지 않은 다운로드 스레드
         self.video_info_thread = None
         self.status_timer = None
 
@@ -502,6 +1435,13 @@ class YouTubeDownloader(QMainWindow):
             self.location_btn.setText("✓ 저장 위치")
             self.show_status("저장 위치가 선택되었습니다.", "success", 3000)
 
+    def select_scratch_directory(self):
+        dir_path = QFileDialog.getExistingDirectory(self, "임시 폴더 선택")
+        if dir_path:
+            self.scratch_path = dir_path
+            self.scratch_btn.setText("✓ 임시 폴더")
+            self.show_status("임시 폴더가 선택되었습니다. 완성된 파일만 저장 위치로 옮겨집니다.", "success", 3000)
+
     def fetch_video_info(self):
         url = self.url_input.text()
         self.download_btn.setEnabled(False)  # 정보 불러오기 전 다운로드 비활성화
@@ -546,20 +1486,43 @@ class YouTubeDownloader(QMainWindow):
         if not self.validate_url(self.url_input.text()):
             self.show_status("올바른 YouTube URL이 아닙니다.", "error", 3000)
             return
+        try:
+            time_ranges, chapters = parse_sections(self.sections_input.text())
+        except ValueError as e:
+            self.show_status(str(e), "error", 3000)
+            return
 
         self.download_btn.hide()
         self.cancel_btn.show()
         self.progress_widget.show()
         self.progress_bar.setValue(0)
         self.url_input.setReadOnly(True)
+        self.sections_input.setReadOnly(True)
 
         format_type = 'mp3' if self.mp3_radio.isChecked() else 'mp4'
         url = self.url_input.text()
+        # 이전 스레드는 시그널을 보낸 직후 아직 실행 중일 수 있으므로 끝날 때까지 참조를 남겨 둠
+        self.finishing_threads = [thread for thread in self.finishing_threads if thread.isRunning()]
+        if self.download_thread and self.download_thread.isRunning():
+            self.finishing_threads.append(self.download_thread)
         self.download_thread = DownloadThread(
             url,
             format_type,
-            self.download_path
+            self.download_path,
+            is_playlist='list=' in url,
+            max_height=self.max_height_combo.currentData(),
+            max_filesize=self.max_size_spin.value() * 1024 * 1024 or None,
+            max_abr=self.max_abr_combo.currentData(),
+            scratch_path=self.scratch_path or None,
+            publisher=self.file_publisher,
+            time_ranges=time_ranges,
+            chapters=chapters,
+            precise_cuts=self.precise_cut_check.isChecked()
         )
+        if self.profile_jobs:
+            self.job_sampler = StackSampler()
+            self.job_sampler.start()
+        self.download_thread.format_plan.connect(self.show_format_plan)
         self.download_thread.progress.connect(self.update_progress)
         self.download_thread.playlist_progress.connect(self.update_playlist_progress)
         self.download_thread.finished.connect(self.download_finished)
@@ -568,21 +1531,15 @@ class YouTubeDownloader(QMainWindow):
 
     def cancel_download(self):
         if self.download_thread and self.download_thread.isRunning():
+            # 스레드가 멈추고 임시 파일을 정리할 때까지 GUI 스레드에서 기다리지 않음.
+            # 스레드가 끝나면 error(또는 finished) 시그널로 화면을 정리함
             self.download_thread.cancel()
-            self.download_thread.wait()
-            
-            try:
-                partial_files = glob.glob(os.path.join(self.download_path, "*.part"))
-                for file in partial_files:
-                    os.remove(file)
-            except Exception as e:
-                print(f"임시 파일 정리 중 오류: {str(e)}")
-            
-            self.show_status("다운로드가 취소되었습니다.", "info", 3000)
-            self.reset_download_state()
+            self.cancel_btn.setEnabled(False)
+            self.show_status("다운로드를 취소하는 중...", "info", 0)
 
     def reset_download_state(self):
         self.cancel_btn.hide()
+        self.cancel_btn.setEnabled(True)
         self.download_btn.show()
         self.progress_widget.hide()
         self.progress_bar.setValue(0)
@@ -591,6 +1548,7 @@ class YouTubeDownloader(QMainWindow):
         self.playlist_progress_label.hide()
         self.playlist_progress_label.setText("")
         self.url_input.setReadOnly(False)  # URL 입력 다시 활성화
+        self.sections_input.setReadOnly(False)
 
     def update_progress(self, data):
         try:
@@ -608,7 +1566,7 @@ class YouTubeDownloader(QMainWindow):
             if 'current_video' in data and 'total_videos' in data:
                 self.playlist_progress_label.show()
                 self.playlist_progress_label.setText(
-                    f"플레이리스트 진행 상황: {data['current_video'] + 1}/{data['total_videos']} 동영상"
+                    f"플레이리스트 진행 상황: {data['current_video'] + 1}/{max(data['total_videos'], data['current_video'] + 1)} 동영상"
                 )
             
             if percentage >= 99.9:
@@ -618,19 +1576,37 @@ class YouTubeDownloader(QMainWindow):
         except Exception as e:
             print(f"Progress update error: {str(e)}")
 
+    def show_format_plan(self, plan):
+        message = f"선택된 형식: {plan['description']}, 예상 크기: {self.format_size(plan['size'])}"
+        if plan.get('over_limit'):
+            self.show_status(f"{message} (크기 제한을 만족하는 형식이 없어 가장 작은 형식을 선택했습니다)", "error", 5000)
+        else:
+            self.show_status(message, "info", 5000)
+
     def update_playlist_progress(self, data):
         try:
             current = data['current']
             total = data['total']
             self.playlist_progress_label.show()
-            self.playlist_progress_label.setText(
-                f"플레이리스트 진행 상황: {current}/{total} 동영상"
-            )
+            text = f"플레이리스트 진행 상황: {current}/{total} 동영상"
+            if data.get('failed'):
+                text += f" (실패 {data['failed']}개)"
+            if data.get('title'):
+                text += f" - {data['title']}"
+            self.playlist_progress_label.setText(text)
+            if data.get('status') == 'error':
+                self.show_status(f"다운로드 실패: {data.get('title') or data.get('id')} - {data.get('error')}", "error", 5000)
         except Exception as e:
             print(f"Playlist progress update error: {str(e)}")
 
     def handle_download_error(self, error):
+        if self.download_thread and self.download_thread.is_cancelled:
+            self.reset_download_state()
+            self.show_job_result("다운로드가 취소되었습니다.", "info", 3000)
+            return
+
         self.cancel_btn.hide()
+        self.cancel_btn.setEnabled(True)
         self.download_btn.show()
         self.progress_widget.hide()
         
@@ -643,19 +1619,36 @@ class YouTubeDownloader(QMainWindow):
         
         error_type = type(error).__name__
         message = error_messages.get(error_type, f'오류가 발생했습니다: {str(error)}')
-        self.show_status(message, "error", 5000)
+        self.show_job_result(message, "error", 5000)
 
     def download_finished(self, filename):
         self.cancel_btn.hide()
+        self.cancel_btn.setEnabled(True)
         self.download_btn.show()
         self.progress_widget.hide()
-        self.show_status("다운로드가 완료되었습니다!", "success", 3000)
+
+        # 플레이리스트는 파일 경로 대신 완료 메시지(실패한 항목 포함)가 넘어옴
+        playlist_entries = self.download_thread.playlist_entries if self.download_thread else []
+        failed_entries = [record for record in playlist_entries if record['status'] == 'error']
+        if failed_entries:
+            self.show_job_result(filename, "error", 10000)
+        else:
+            self.show_job_result("다운로드가 완료되었습니다!", "success", 3000)
         
         file_path = os.path.abspath(filename)
+        # 구간을 여러 개 받으면 구간마다 파일이 생김
+        downloaded_files = (self.download_thread.downloaded_files if self.download_thread else []) or [filename]
+        if playlist_entries:
+            message = filename
+        elif len(downloaded_files) > 1:
+            message = f"{len(downloaded_files)}개 파일이 저장되었습니다: " + ", ".join(
+                os.path.basename(path) for path in downloaded_files)
+        else:
+            message = f"파일이 저장되었습니다: {os.path.basename(filename)}"
         
         self.tray_icon.showMessage(
             "다운로드 완료",
-            f"파일이 저장되었습니다: {os.path.basename(filename)}",
+            message,
             QSystemTrayIcon.MessageIcon.Information,
             5000
         )
@@ -673,9 +1666,9 @@ class YouTubeDownloader(QMainWindow):
         
         QTimer.singleShot(5000, lambda: temp_widget.deleteLater())
         
-        self.save_download_history(filename)
+        self.save_download_history(downloaded_files)
 
-    def save_download_history(self, filename):
+    def save_download_history(self, filenames):
         history_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_history.json')
         history = []
         
@@ -686,12 +1679,13 @@ class YouTubeDownloader(QMainWindow):
         except Exception:
             pass
         
-        history.append({
-            'filename': os.path.basename(filename),
-            'path': os.path.abspath(filename),
-            'date': datetime.datetime.now().isoformat(),
-            'url': self.url_input.text()
-        })
+        for filename in filenames:
+            history.append({
+                'filename': os.path.basename(filename),
+                'path': os.path.abspath(filename),
+                'date': datetime.datetime.now().isoformat(),
+                'url': self.url_input.text()
+            })
         
         history = history[-100:]
         
@@ -764,6 +1758,11 @@ class YouTubeDownloader(QMainWindow):
             return "계산중..."
         return f"{speed / 1024 / 1024:.2f} MB/s"
 
+    def format_size(self, size):
+        if not size:
+            return "알 수 없음"
+        return f"{size / 1024 / 1024:.1f} MB"
+
     def format_time(self, seconds):
         if not seconds:
             return "계산중..."
@@ -783,8 +1782,45 @@ class YouTubeDownloader(QMainWindow):
         if urls:
             self.url_input.setText(urls[0])
 
-if __name__ == '__main__':
+def main():
+    parser = argparse.ArgumentParser(description="Youtube Extractor")
+    parser.add_argument('--store', help="작업 저장소 (.db 파일 또는 공유 디렉터리)")
+    parser.add_argument('--enqueue', metavar='URL', help="작업 저장소에 URL 추가")
+    parser.add_argument('--format', dest='format_type', choices=['mp4', 'mp3'], default='mp4')
+    parser.add_argument('--path', dest='download_path', default='.', help="다운로드 위치")
+    parser.add_argument('--sections', default='', help="받을 구간/챕터 (예: \"1:02:00-1:02:30, 인트로\")")
+    parser.add_argument('--worker', action='store_true', help="작업 저장소의 작업을 처리하는 워커로 실행")
+    parser.add_argument('--lease', type=int, default=60, help="작업 lease 시간(초)")
+    parser.add_argument('--drain', action='store_true', help="대기 중인 작업이 없으면 워커 종료")
+    parser.add_argument('--scratch', help="다운로드/병합/변환 작업에 사용할 빠른 임시 폴더")
+    parser.add_argument('--diagnostics', action='store_true', help="GUI 이벤트 루프 지연 측정(진단 모드)을 켜고 시작")
+    parser.add_argument('--profile-jobs', action='store_true', help="다운로드 작업마다 스택 샘플링 프로파일 저장")
+    args = parser.parse_args()
+
+    if args.enqueue or args.worker:
+        if not args.store:
+            parser.error("--enqueue/--worker 에는 --store 가 필요합니다.")
+        store = open_job_store(args.store)
+        if args.enqueue:
+            try:
+                job_ids = enqueue_jobs(store, args.enqueue, args.format_type, os.path.abspath(args.download_path),
+                                       args.sections)
+            except ValueError as e:
+                parser.error(str(e))
+            print(f"{len(job_ids)}개 작업이 추가되었습니다.")
+        if args.worker:
+            run_worker(store, lease_seconds=args.lease, drain=args.drain,
+                       runner=lambda job, should_continue: run_download_job(job, should_continue, args.scratch))
+        return
+
     app = QApplication(sys.argv)
     window = YouTubeDownloader()
+    if args.diagnostics:
+        window.set_diagnostics_enabled(True)
+    if args.profile_jobs:
+        window.set_job_profiling_enabled(True)
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
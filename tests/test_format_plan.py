@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index
+
+MB = 1024 * 1024
+
+
+def progressive(format_id, height, size):
+    return {'format_id': format_id, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': height,
+            'filesize': size}
+
+
+def video(format_id, height, size):
+    return {'format_id': format_id, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'none', 'height': height,
+            'filesize': size}
+
+
+def audio(format_id, ext, abr, size):
+    return {'format_id': format_id, 'ext': ext, 'vcodec': 'none', 'acodec': 'opus' if ext == 'webm' else 'mp4a',
+            'abr': abr, 'filesize': size}
+
+
+FORMATS = [
+    progressive('18', 360, 10 * MB),
+    video('134', 360, 8 * MB),
+    video('136', 720, 30 * MB),
+    audio('140', 'm4a', 129, 3 * MB),
+    audio('251', 'webm', 140, 4 * MB),
+]
+
+
+@pytest.mark.parametrize('formats, format_type, limits, format_spec, over_limit', [
+    # 제한이 없으면 가장 높은 해상도
+    (FORMATS, 'mp4', {}, '136+140', False),
+    # 같은 360p면 병합이 필요 없는 단일 파일이 더 쌈 (10MB < (8+3)MB + 10%)
+    (FORMATS, 'mp4', {'max_height': 480}, '18', False),
+    # 단일 파일이 훨씬 크면 병합을 선택
+    ([progressive('18', 360, 20 * MB)] + FORMATS[1:], 'mp4', {'max_height': 480}, '134+140', False),
+    # 크기 제한 때문에 해상도를 낮춤
+    (FORMATS, 'mp4', {'max_filesize': 20 * MB}, '18', False),
+    # 제한을 만족하는 방식이 없으면 가장 작은 방식
+    (FORMATS, 'mp4', {'max_filesize': 5 * MB}, '18', True),
+    # 구간만 받으면 예상 크기가 줄어들어 제한 안에 들어옴
+    (FORMATS, 'mp4', {'max_filesize': 20 * MB, 'clip_ratio': 0.5}, '136+140', False),
+    # m4a 오디오가 없으면 영상만 있는 포맷은 고를 수 없음
+    ([video('136', 720, 30 * MB), audio('251', 'webm', 140, 4 * MB)], 'mp4', {}, None, None),
+    ([progressive('18', 360, 10 * MB), video('136', 720, 30 * MB)], 'mp4', {}, '18', False),
+    # MP3는 가장 높은 비트레이트, 128 제한에는 abr 129 AAC는 들어오지만 140kbps opus는 제외
+    (FORMATS, 'mp3', {}, '251', False),
+    (FORMATS, 'mp3', {'max_abr': 128}, '140', False),
+    ([], 'mp3', {}, None, None),
+])
+def test_plan_format(formats, format_type, limits, format_spec, over_limit):
+    plan = index.plan_format(formats, format_type, duration=600, **limits)
+    if format_spec is None:
+        assert plan is None
+    else:
+        assert plan['format_spec'] == format_spec
+        assert plan['over_limit'] == over_limit
+
+
+def test_size_is_estimated_from_bitrate():
+    formats = [{'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360, 'tbr': 800}]
+    plan = index.plan_format(formats, 'mp4', duration=60, clip_ratio=0.5)
+    assert plan['size'] == 800 * 125 * 60 // 2
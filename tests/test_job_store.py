@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import uuid
+import sqlite3
+import multiprocessing
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index
+
+
+def job_statuses(store):
+    if isinstance(store, index.SQLiteJobStore):
+        conn = sqlite3.connect(store.db_path)
+        try:
+            return dict(conn.execute("SELECT url, status FROM jobs").fetchall())
+        finally:
+            conn.close()
+    statuses = {}
+    for state in ('pending', 'running', 'done', 'failed'):
+        for name in os.listdir(os.path.join(store.root, state)):
+            if name.endswith('.json'):
+                url = store._read(os.path.join(store.root, state, name))['url']
+                assert url not in statuses, f"{url} 작업이 두 군데에 있음"
+                statuses[url] = state
+    return statuses
+
+
+@pytest.fixture(params=['sqlite', 'directory'])
+def store_location(request, tmp_path):
+    if request.param == 'sqlite':
+        return str(tmp_path / 'jobs.db')
+    return str(tmp_path / 'jobs')
+
+
+def fake_runner(marks_dir, fail_first=False):
+    def runner(job, should_continue):
+        # 실제 다운로드 대신 호출 기록만 남김
+        open(os.path.join(marks_dir, f"{job['url']}-{uuid.uuid4().hex}"), 'w').close()
+        time.sleep(0.01)
+        if fail_first and job['attempts'] == 1:
+            raise Exception("first attempt fails")
+        return job['url']
+    return runner
+
+
+def worker_process(location, marks_dir, fail_first=False):
+    index.run_worker(index.open_job_store(location), lease_seconds=30, poll_interval=0.1,
+                     drain=True, runner=fake_runner(marks_dir, fail_first))
+
+
+def run_workers(location, marks_dir, fail_first=False, count=4):
+    workers = [multiprocessing.Process(target=worker_process, args=(location, str(marks_dir), fail_first))
+               for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+
+def test_workers_drain_queue_once(store_location, tmp_path):
+    store = index.open_job_store(store_location)
+    urls = [f"video{i}" for i in range(30)]
+    for url in urls:
+        store.add_job(url, 'mp4', str(tmp_path))
+    marks_dir = tmp_path / 'marks'
+    marks_dir.mkdir()
+
+    run_workers(store_location, marks_dir)
+
+    runs = [name.rsplit('-', 1)[0] for name in os.listdir(marks_dir)]
+    assert sorted(runs) == sorted(urls)
+    assert job_statuses(store) == {url: 'done' for url in urls}
+
+
+def test_failed_jobs_are_retried_once(store_location, tmp_path):
+    store = index.open_job_store(store_location)
+    urls = [f"video{i}" for i in range(30)]
+    for url in urls:
+        store.add_job(url, 'mp4', str(tmp_path))
+    marks_dir = tmp_path / 'marks'
+    marks_dir.mkdir()
+
+    run_workers(store_location, marks_dir, fail_first=True)
+
+    runs = [name.rsplit('-', 1)[0] for name in os.listdir(marks_dir)]
+    assert sorted(runs) == sorted(urls * 2)
+    assert job_statuses(store) == {url: 'done' for url in urls}
+
+
+def test_retried_job_is_complete_when_it_reappears(tmp_path):
+    store = index.DirectoryJobStore(str(tmp_path / 'jobs'))
+    other = index.DirectoryJobStore(str(tmp_path / 'jobs'))
+    store.add_job('video', 'mp4', str(tmp_path))
+    job = store.claim('a', 30)
+
+    claimed = []
+    write = store._write
+
+    def write_then_claim(path, job, lease_expires=None):
+        write(path, job, lease_expires)
+        # 작업이 pending에 나타나자마자 다른 워커가 가져감
+        claimed.append(other.claim('b', 30))
+
+    store._write = write_then_claim
+    assert store.fail(job['id'], 'a', 'boom')
+
+    assert claimed[0]['id'] == job['id']
+    assert claimed[0]['attempts'] == 2
+    assert claimed[0]['result'] == 'boom'
+    assert job_statuses(store) == {'video': 'running'}
+    assert other.complete(job['id'], 'b', 'video')
+    assert job_statuses(store) == {'video': 'done'}
+
+
+class FlakyHeartbeatStore:
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_heartbeat_errors_stop_the_job(store_location, tmp_path):
+    store = index.open_job_store(store_location)
+    store.add_job('video', 'mp4', str(tmp_path))
+    cancelled = []
+
+    def runner(job, should_continue):
+        deadline = time.time() + 5
+        while should_continue() and time.time() < deadline:
+            time.sleep(0.01)
+        cancelled.append(not should_continue())
+        raise Exception("cancelled")
+
+    index.run_worker(FlakyHeartbeatStore(store), worker_id='w1', lease_seconds=0.3, poll_interval=0.1,
+                     drain=True, runner=runner)
+
+    assert cancelled == [True]
+    # lease를 잃었으므로 결과를 기록하지 않고, 다른 워커가 다시 가져갈 수 있음
+    time.sleep(0.3)
+    assert store.claim('w2', 30)['attempts'] == 2
+
+
+def test_expired_lease_is_reclaimed(store_location, tmp_path):
+    store = index.open_job_store(store_location)
+    store.add_job('video', 'mp4', str(tmp_path))
+
+    job = store.claim('dead', 0.1)
+    assert store.claim('alive', 30) is None
+    time.sleep(0.3)
+
+    reclaimed = store.claim('alive', 30)
+    assert reclaimed['id'] == job['id']
+    assert reclaimed['attempts'] == 2
+    assert not store.heartbeat(job['id'], 'dead', 30)
+    assert not store.complete(job['id'], 'dead', 'late')
+    assert store.heartbeat(job['id'], 'alive', 30)
+    assert store.complete(job['id'], 'alive', 'video')
+    assert job_statuses(store) == {'video': 'done'}
+
+
+def test_job_fails_after_last_attempt_expires(store_location, tmp_path):
+    store = index.open_job_store(store_location)
+    store.max_attempts = 2
+    store.add_job('video', 'mp4', str(tmp_path))
+
+    for worker_id in ('w1', 'w2'):
+        assert store.claim(worker_id, 0.1) is not None
+        time.sleep(0.3)
+
+    assert store.claim('w3', 30) is None
+    assert job_statuses(store) == {'video': 'failed'}
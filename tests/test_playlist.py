@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index
+
+
+class FakeYDL:
+    """플레이리스트 항목을 generator로 하나씩 넘겨주고 호출 순서를 기록하는 가짜 YoutubeDL"""
+
+    def __init__(self, video_ids, broken=()):
+        self.video_ids = video_ids
+        self.broken = broken
+        self.events = []
+
+    def entries(self):
+        for video_id in self.video_ids:
+            self.events.append(f"enumerate {video_id}")
+            yield {'_type': 'url', 'url': f"https://youtu.be/{video_id}", 'ie_key': 'Youtube',
+                   'id': video_id, 'title': f"title {video_id}", 'duration': 60}
+
+    def extract_info(self, url, download=False, process=True, ie_key=None):
+        assert not download and not process
+        if 'list=' in url:
+            return {'_type': 'playlist', 'id': 'PL', 'entries': self.entries()}
+        video_id = url.rsplit('/', 1)[1]
+        return {'id': video_id, 'title': f"title {video_id}", 'duration': 60}
+
+    def process_ie_result(self, info, download=True):
+        self.events.append(f"download {info['id']}")
+        if info['id'] in self.broken:
+            raise Exception("Video unavailable")
+        return dict(info, requested_downloads=[{'filepath': f"{info['title']}.mp4"}])
+
+
+def test_entries_are_downloaded_as_they_arrive():
+    ydl = FakeYDL(['a', 'b', 'c'], broken=['b'])
+    thread = index.DownloadThread('https://www.youtube.com/playlist?list=PL', 'mp4', '.', is_playlist=True)
+    progress = []
+    thread.playlist_progress.connect(progress.append)
+
+    message = thread.download_playlist(ydl)
+
+    assert ydl.events == ['enumerate a', 'download a', 'enumerate b', 'download b', 'enumerate c', 'download c']
+    assert [(record['id'], record['status']) for record in thread.playlist_entries] == [
+        ('a', 'finished'), ('b', 'error'), ('c', 'finished')]
+    assert thread.playlist_entries[1]['error'] == "Video unavailable"
+    assert [data['current'] for data in progress] == [1, 2, 3]
+    assert progress[-1]['failed'] == 1
+    assert message == "플레이리스트 다운로드 완료: 3개 중 1개 실패 (title b)"
+
+
+def test_cancel_stops_enumeration():
+    ydl = FakeYDL(['a', 'b', 'c'])
+    thread = index.DownloadThread('https://www.youtube.com/playlist?list=PL', 'mp4', '.', is_playlist=True)
+    thread.playlist_progress.connect(lambda data: thread.cancel())
+
+    with pytest.raises(Exception, match="다운로드가 취소되었습니다"):
+        thread.download_playlist(ydl)
+    assert ydl.events == ['enumerate a', 'download a', 'enumerate b']
@@ -0,0 +1,92 @@
+import os
+import sys
+import errno
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    scratch, dest = tmp_path / 'scratch', tmp_path / 'dest'
+    scratch.mkdir()
+    dest.mkdir()
+    return scratch, dest
+
+
+def make_file(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+@pytest.fixture(params=['link', 'no_link', 'other_drive'])
+def filesystem(request, monkeypatch, dirs):
+    """하드 링크가 되는 경우, 하드 링크를 지원하지 않는 경우, 다른 드라이브라 복사해야 하는 경우"""
+    scratch, _ = dirs
+    if request.param == 'link':
+        return request.param
+
+    def no_link(src, dst):
+        raise OSError(errno.EPERM, "hard links not supported")
+    monkeypatch.setattr(index.os, 'link', no_link)
+
+    if request.param == 'other_drive':
+        replace = os.replace
+
+        def cross_device_replace(src, dst):
+            if os.path.dirname(src) == str(scratch):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            replace(src, dst)
+        monkeypatch.setattr(index.os, 'replace', cross_device_replace)
+    return request.param
+
+
+def test_publish_moves_file(filesystem, dirs):
+    scratch, dest = dirs
+    src = make_file(scratch / 'video.mp4', b'new')
+
+    assert index.FilePublisher.publish(src, str(dest)) == str(dest / 'video.mp4')
+    assert (dest / 'video.mp4').read_bytes() == b'new'
+    assert os.listdir(scratch) == []
+    assert os.listdir(dest) == ['video.mp4']
+
+
+def test_publish_does_not_overwrite(filesystem, dirs):
+    scratch, dest = dirs
+    make_file(dest / 'video.mp4', b'old')
+    make_file(dest / 'video (1).mp4', b'older')
+    src = make_file(scratch / 'video.mp4', b'new')
+
+    assert index.FilePublisher.publish(src, str(dest)) == str(dest / 'video (2).mp4')
+    assert (dest / 'video.mp4').read_bytes() == b'old'
+    assert (dest / 'video (1).mp4').read_bytes() == b'older'
+    assert (dest / 'video (2).mp4').read_bytes() == b'new'
+    assert os.listdir(scratch) == []
+    assert len(os.listdir(dest)) == 3  # 복사용 임시 파일이 남지 않음
+
+
+def test_place_adds_number_when_destination_exists(dirs):
+    scratch, dest = dirs
+    make_file(dest / 'clip [10].mp4', b'old')
+    src = make_file(scratch / 'clip [10].mp4', b'new')
+
+    assert index.FilePublisher.place(src, str(dest / 'clip [10].mp4')) == str(dest / 'clip [10] (1).mp4')
+    assert (dest / 'clip [10].mp4').read_bytes() == b'old'
+    assert not os.path.exists(src)
+
+
+def test_same_name_published_together(dirs):
+    scratch, dest = dirs
+    publisher = index.FilePublisher(max_workers=2)
+    futures = []
+    for i in range(4):
+        job_dir = scratch / f"job{i}"
+        job_dir.mkdir()
+        futures.append(publisher.submit(make_file(job_dir / 'video.mp4', str(i).encode()), str(dest)))
+
+    paths = [future.result() for future in futures]
+    assert len(set(paths)) == 4
+    assert sorted(open(path, 'rb').read() for path in paths) == [b'0', b'1', b'2', b'3']
@@ -0,0 +1,52 @@
+import os
+import sys
+import math
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index
+
+
+@pytest.mark.parametrize('text, time_ranges, chapters', [
+    ('', [], []),
+    ('10-20', [(10, 20)], []),
+    ('1:02:00-1:02:30.5', [(3720, 3750.5)], []),
+    ('1:30 - 2:00, 인트로', [(90, 120)], ['인트로']),
+    # 끝 시간을 비우면 영상 끝까지
+    ('5:00-', [(300, math.inf)], []),
+    ('Part 2, , 아웃트로', [], ['Part 2', '아웃트로']),
+])
+def test_parse_sections(text, time_ranges, chapters):
+    assert index.parse_sections(text) == (time_ranges, chapters)
+
+
+@pytest.mark.parametrize('text', ['10-20-30', '20-10', '10-10', '1:30', '-20', '1:2:3:4-5'])
+def test_malformed_sections_are_rejected(text):
+    with pytest.raises(ValueError):
+        index.parse_sections(text)
+
+
+CHAPTERS = [
+    {'title': 'Intro', 'start_time': 0, 'end_time': 30},
+    {'title': 'Main part', 'start_time': 30, 'end_time': 270},
+    {'title': 'Outro', 'start_time': 270, 'end_time': 300},
+]
+
+
+@pytest.mark.parametrize('time_ranges, chapters, info, ratio', [
+    ([], [], {'duration': 300, 'chapters': CHAPTERS}, 1.0),
+    ([(0, 60)], [], {'duration': 300}, 0.2),
+    # 열린 끝은 영상 길이에서 잘림
+    ([(240, math.inf)], [], {'duration': 300}, 0.2),
+    # 챕터 이름은 대소문자 구분 없이 부분 일치
+    ([], ['intro', 'OUTRO'], {'duration': 300, 'chapters': CHAPTERS}, 0.2),
+    ([(0, 60)], ['main'], {'duration': 300, 'chapters': CHAPTERS}, 1.0),
+    # 챕터 정보가 없거나 길이를 모르면 전체 크기로 추정
+    ([], ['intro'], {'duration': 300}, 1.0),
+    ([(0, 60)], [], {}, 1.0),
+])
+def test_clip_ratio(time_ranges, chapters, info, ratio):
+    thread = index.DownloadThread('https://youtu.be/x', 'mp4', '.', time_ranges=time_ranges, chapters=chapters)
+    assert thread.clip_ratio(info) == pytest.approx(ratio)